@@ -1,31 +1,60 @@
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import gc
 import os
 import sys
 import wandb
 
+import numpy as np
 import pandas as pd
 import torch
+import torch.distributed as dist
 import torchvision.transforms as transforms
 from torch.optim import SGD
 from spuco.last_layer_retrain import DISPEL
 
-from spuco.datasets import UrbanCars, UrbanCarsSpuriousLabel, GroupLabeledDatasetWrapper
+from spuco.datasets import UrbanCars, UrbanCarsSpuriousLabel, GroupLabeledDatasetWrapper, CachedDatasetWrapper
 from spuco.evaluate import Evaluator
 from spuco.robust_train import ERM
 from spuco.models import model_factory
-from spuco.utils import set_seed
+from spuco.utils import set_seed, fuse_input_normalization
+
+IMAGENET_MEAN, IMAGENET_STD = (0.485, 0.456, 0.406), (0.229, 0.224, 0.225)
+AMP_DTYPES = {"off": None, "bf16": torch.bfloat16, "fp16": torch.float16}
+
+
+def load_split(root, split, spurious_label_type, transform, base_transform):
+    # module level so it can be pickled into a worker process
+    dataset = UrbanCars(root=root, split=split, spurious_label_type=spurious_label_type, verbose=False, transform=transform, base_transform=base_transform)
+    dataset.initialize()
+    return dataset
 
 
 def main(args):
-    if args.wandb:
-        wandb.init(project=args.wandb_project, entity=args.wandb_entity, name=args.wandb_run_name, config=args)
+    # launched with torchrun: one process per GPU, only rank 0 logs / evaluates / writes results
+    # NOTE: --batch_size is per process, so the effective batch size is world_size * batch_size 
+    # (--erm_lr is not rescaled)
+    distributed = "LOCAL_RANK" in os.environ
+    if distributed:
+        dist.init_process_group("nccl")
+        args.gpu = int(os.environ["LOCAL_RANK"])
+        torch.cuda.set_device(args.gpu)
+    is_main = not distributed or dist.get_rank() == 0
+
+    if not is_main:
+        args.wandb = False
+        sys.stdout = open(os.devnull, "w")
+    elif args.wandb:
+        # no console capture (training is verbose); --wandb_offline defers syncing (`wandb sync`) for sweeps
+        wandb.init(
+            project=args.wandb_project, entity=args.wandb_entity, name=args.wandb_run_name, config=args,
+            mode="offline" if args.wandb_offline else "online", settings=wandb.Settings(console="off")
+        )
         # remove the stdout_file argument
         del args.stdout_file
         del args.results_csv
     else:
         # check if the stdout file already exists, and if want to overwrite it
-        DT_STRING = "".join(str(datetime.now()).split())
         args.stdout_file = f"{args.stdout_file}"
         if os.path.exists(args.stdout_file):
             print(f"stdout file {args.stdout_file} already exists, overwrite? (y/n)")
@@ -42,34 +71,61 @@ def main(args):
     set_seed(args.seed)
 
     # Load the full dataset, and download it if necessary
-    transform = transforms.Compose([
+    # resize / crop the decoded PIL image before converting it to a tensor
+    base_transform = transforms.Compose([
                 transforms.Resize(256),
                 transforms.CenterCrop(224),
-                transforms.Normalize((0.485, 0.456, 0.406), (0.229, 0.224, 0.225))
+                transforms.ToTensor()
             ])
+    # with --fuse_normalize, normalization is folded into the model's first conv instead
+    transform = None if args.fuse_normalize else transforms.Normalize(IMAGENET_MEAN, IMAGENET_STD)
 
-    trainset=UrbanCars(root=args.root_dir, split="train", spurious_label_type=UrbanCarsSpuriousLabel.BOTH, verbose=True, transform=transform)
-    trainset.initialize()
-
+    # UrbanCars.__init__ partitions examples in a pure-Python loop that holds the GIL,
+    # so build the three splits in separate processes (progress bars are disabled there)
     print(f'Using {args.spurious_label_type} spurious labels for validation')
-    valset=UrbanCars(root=args.root_dir, split="val", spurious_label_type=args.spurious_label_type, verbose=True, transform=transform)
-    valset.initialize()
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        trainset = executor.submit(load_split, args.root_dir, "train", UrbanCarsSpuriousLabel.BOTH, transform, base_transform)
+        valset = executor.submit(load_split, args.root_dir, "val", args.spurious_label_type, transform, base_transform)
+        testset = executor.submit(load_split, args.root_dir, "test", UrbanCarsSpuriousLabel.BOTH, transform, base_transform)
+    trainset, valset, testset = trainset.result(), valset.result(), testset.result()
 
-    testset=UrbanCars(root=args.root_dir, split="test", spurious_label_type=UrbanCarsSpuriousLabel.BOTH, verbose=True, transform=transform)
-    testset.initialize()
+    # transforms are deterministic, so optionally compute them once and read them back from disk
+    if args.cache_dir is not None:
+        if distributed and not is_main:
+            dist.barrier()
+        suffix = "_unnormalized" if args.fuse_normalize else ""
+        trainset = CachedDatasetWrapper(trainset, os.path.join(args.cache_dir, f"urbancars_train{suffix}.npy"), num_workers=args.num_workers, verbose=is_main)
+        valset = CachedDatasetWrapper(valset, os.path.join(args.cache_dir, f"urbancars_val{suffix}.npy"), num_workers=args.num_workers, verbose=is_main)
+        testset = CachedDatasetWrapper(testset, os.path.join(args.cache_dir, f"urbancars_test{suffix}.npy"), num_workers=args.num_workers, verbose=is_main)
+        if distributed and is_main:
+            dist.barrier()
 
     # initialize the model and the trainer
     model = model_factory(args.arch, trainset[0][0].shape, trainset.num_classes, pretrained=args.pretrained).to(device)
+    if args.fuse_normalize:
+        fuse_input_normalization(model.backbone.conv1, IMAGENET_MEAN, IMAGENET_STD)
+    memory_format = torch.channels_last if args.channels_last else torch.preserve_format
+    if args.channels_last:
+        model = model.to(memory_format=memory_format)
+    if args.compile:
+        # compile in place so that attributes (backbone) and state_dict keys are unchanged
+        # (nn.Module.compile needs torch >= 2.2, older versions compile the bound forward instead).
+        # Default mode rather than "reduce-overhead": shapes are not fixed (partial last batch, 
+        # evaluator batches in eval mode), so CUDA graphs would be re-captured
+        torch.set_float32_matmul_precision("high")
+        if hasattr(model, "compile"):
+            model.compile()
+        else:
+            model.forward = torch.compile(model.forward)
     
     # initialize the group weights
-    if args.spurious_label_type == UrbanCarsSpuriousLabel.BG:
-        group_weights = {}
-        for key in valset.group_partition.keys():
-            group_weights[key] = trainset.group_weights[(key[0], (0, key[1]))] + trainset.group_weights[(key[0], (1, key[1]))]
-    elif args.spurious_label_type == UrbanCarsSpuriousLabel.CO_OCCUR:
-        group_weights = {}
-        for key in valset.group_partition.keys():
-            group_weights[key] = trainset.group_weights[(key[0], (key[1], 0))] + trainset.group_weights[(key[0], (key[1], 1))]
+    if args.spurious_label_type in [UrbanCarsSpuriousLabel.BG, UrbanCarsSpuriousLabel.CO_OCCUR]:
+        # dense [class, spurious_0, spurious_1] array of the train group weights, marginalized over one spurious feature
+        weights = np.zeros((trainset.num_classes, 2, 2))
+        for (label, spurious_label), weight in trainset.group_weights.items():
+            weights[(label, *spurious_label)] = weight
+        marginal = weights.sum(axis=1 if args.spurious_label_type == UrbanCarsSpuriousLabel.BG else 2)
+        group_weights = {key: float(marginal[key]) for key in valset.group_partition.keys()}
     else:
         group_weights = trainset.group_weights
             
@@ -80,7 +136,10 @@ def main(args):
         batch_size=args.batch_size,
         model=model,
         device=device,
-        verbose=True
+        verbose=True,
+        num_workers=args.num_workers,
+        persistent_workers=True,
+        amp_dtype=AMP_DTYPES[args.eval_amp]
     )
     
     if args.erm_model_path is not None:
@@ -88,17 +147,33 @@ def main(args):
     else:
         erm = ERM(
             model=model,
-            val_evaluator=valid_evaluator,
+            val_evaluator=valid_evaluator if is_main else None,
             num_epochs=args.num_epochs,
             trainset=trainset,
             batch_size=args.batch_size,
             optimizer=SGD(model.parameters(), lr=args.erm_lr, weight_decay=args.erm_weight_decay, momentum=args.momentum),
             device=device,
-            verbose=True,
-            use_wandb=args.wandb
+            verbose=is_main,
+            use_wandb=args.wandb,
+            num_workers=args.num_workers,
+            distributed=distributed,
+            amp_dtype=AMP_DTYPES[args.amp],
+            memory_format=memory_format
         )
 
         erm.train()
+
+        # release the optimizer state (momentum buffers), gradients and best-model copy before DISPEL
+        del erm
+        model.zero_grad(set_to_none=True)
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    if distributed:
+        dist.destroy_process_group()
+        if not is_main:
+            return
         
     group_labeled_set = GroupLabeledDatasetWrapper(dataset=valset, group_partition=valset.group_partition)
 
@@ -114,31 +189,25 @@ def main(args):
 
     lrmix.train()
 
-    results = pd.DataFrame(index=[0])
+    results = {}
 
-    evaluator = Evaluator(
+    # re-use the validation evaluator for the final evaluations
+    evaluator = valid_evaluator
+    evaluator.rebind(
         testset=valset,
         group_partition=valset.group_partition,
         group_weights=group_weights,
-        batch_size=args.batch_size,
-        model=model,
-        sklearn_linear_model=lrmix.linear_model,
-        device=device,
-        verbose=True
+        sklearn_linear_model=lrmix.linear_model
         )
     evaluator.evaluate()
     results[f"val_wg_acc"] = evaluator.worst_group_accuracy[1]
     results[f"val_avg_acc"] = evaluator.average_accuracy
 
-    evaluator = Evaluator(
+    evaluator.rebind(
         testset=testset,
         group_partition=testset.group_partition,
         group_weights=trainset.group_weights,
-        batch_size=64,
-        model=model,
-        sklearn_linear_model=lrmix.linear_model,
-        device=device,
-        verbose=True
+        sklearn_linear_model=lrmix.linear_model
         )
     evaluator.evaluate()
     results[f"test_wg_acc"] = evaluator.worst_group_accuracy[1]
@@ -147,25 +216,25 @@ def main(args):
     print(results)
 
     if args.wandb:
-        # convert the results to a dictionary
-        results = results.to_dict(orient="records")[0]
         wandb.log(results)
     else:
         results["alg"] = "lrmix"
         results["timestamp"] = pd.Timestamp.now()
-        args_dict = vars(args)
-        for key in args_dict.keys():
-            results[key] = args_dict[key]
+        results.update(vars(args))
+        # build the one-row DataFrame once all columns are known
+        results = pd.DataFrame([results])
 
-        results
-
-        if os.path.exists(args.results_csv):
-            results_df = pd.read_csv(args.results_csv)
+        if not os.path.exists(args.results_csv):
+            results.to_csv(args.results_csv, index=False)
         else:
-            results_df = pd.DataFrame()
-
-        results_df = pd.concat([results_df, results], ignore_index=True)
-        results_df.to_csv(args.results_csv, index=False)
+            # append only the new row, in the column order of the existing file
+            columns = pd.read_csv(args.results_csv, nrows=0).columns
+            if set(columns) == set(results.columns):
+                results[columns].to_csv(args.results_csv, mode="a", header=False, index=False)
+            else:
+                # columns changed (e.g. new arguments), so the whole file has to be rewritten
+                results_df = pd.concat([pd.read_csv(args.results_csv), results], ignore_index=True)
+                results_df.to_csv(args.results_csv, index=False)
 
         print('Results saved to', args.results_csv)
 
@@ -188,16 +257,24 @@ if __name__ == '__main__':
     parser.add_argument("--results_csv", type=str, default="results/urbancars_lrmix.csv")
     parser.add_argument("--stdout_file", type=str, default="urbancars_lrmix.out")
     parser.add_argument("--arch", type=str, default="resnet50", choices=["resnet18", "resnet50", "cliprn50"])
-    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--batch_size", type=int, default=128, help="batch size per process when launched with torchrun")
+    parser.add_argument("--num_workers", type=int, default=4)
+    parser.add_argument("--cache_dir", type=str, default=None)
     parser.add_argument("--num_epochs", type=int, default=300)
     parser.add_argument("--erm_lr", type=float, default=1e-3)
     parser.add_argument("--erm_weight_decay", type=float, default=1e-4)
     parser.add_argument("--momentum", type=float, default=0.9)
     parser.add_argument("--pretrained", action="store_true")
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--channels_last", action="store_true")
+    parser.add_argument("--fuse_normalize", action="store_true")
+    parser.add_argument("--amp", type=str, default="off", choices=list(AMP_DTYPES.keys()))
+    parser.add_argument("--eval_amp", type=str, default="off", choices=list(AMP_DTYPES.keys()))
     parser.add_argument("--wandb", action="store_true")
     parser.add_argument("--wandb_project", type=str, default="spuco")
     parser.add_argument("--wandb_entity", type=str, default=None)
     parser.add_argument("--wandb_run_name", type=str, default="urbancars_lrmix")
+    parser.add_argument("--wandb_offline", action="store_true")
     
     parser.add_argument("--erm_model_path", type=str, default=None)
 
@@ -4,6 +4,7 @@ from .base_spuco_dataset import MASK_CORE, MASK_SPURIOUS
 from .spurious_target_dataset_wrapper import SpuriousTargetDatasetWrapper
 from .group_labeled_dataset_wrapper import GroupLabeledDatasetWrapper
 from .index_dataset_wrapper import IndexDatasetWrapper
+from .cached_dataset_wrapper import CachedDatasetWrapper
 from .wilds_dataset_wrapper import WILDSDatasetWrapper
 from .spuco_mnist import SpuCoMNIST
 from .spuco_birds import SpuCoBirds
@@ -0,0 +1,142 @@
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from spuco.datasets import BaseSpuCoCompatibleDataset
+
+
+class CachedDatasetWrapper(BaseSpuCoCompatibleDataset):
+    """
+    Wrapper class that precomputes the (deterministic) transformed inputs of a
+    SpuCo compatible dataset once and stores them on disk as a float16 memory-mapped
+    array, so that decoding and transforms are not repeated every epoch.
+    """
+    def __init__(
+        self,
+        dataset: BaseSpuCoCompatibleDataset,
+        cache_path: str,
+        batch_size: int = 64,
+        num_workers: int = 4,
+        verbose: bool = False
+    ):
+        """
+        Initializes a CachedDatasetWrapper, building the cache at cache_path if it does not exist yet.
+
+        :param dataset: The underlying dataset. Its transforms must be deterministic.
+        :type dataset: BaseSpuCoCompatibleDataset
+        :param cache_path: Path of the .npy file used to store the cached inputs.
+        :type cache_path: str
+        :param batch_size: Batch size used while building the cache. Default is 64.
+        :type batch_size: int, optional
+        :param num_workers: Number of DataLoader workers used while building the cache. Default is 4.
+        :type num_workers: int, optional
+        :param verbose: Show logs. Default is False.
+        :type verbose: bool, optional
+        """
+        super().__init__()
+
+        self.dataset = dataset
+        self.cache_path = cache_path
+        self.verbose = verbose
+        self._cache = None
+
+        if not os.path.exists(self.cache_path):
+            self._build_cache(batch_size, num_workers)
+        if self.cache.shape[0] != len(self.dataset):
+            raise ValueError(
+                f"Cache at {self.cache_path} holds {self.cache.shape[0]} examples but the dataset has {len(self.dataset)}; "
+                "it was likely built from a different dataset, delete it to rebuild."
+            )
+
+    def _build_cache(self, batch_size: int, num_workers: int):
+        """
+        Runs the underlying dataset once and writes its inputs to cache_path.
+        """
+        dirname = os.path.dirname(self.cache_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        if len(self.dataset) == 0:
+            raise ValueError("Cannot build a cache for an empty dataset")
+        loader = DataLoader(self.dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+
+        tmp_path = f"{self.cache_path}.tmp.npy"
+        cache = None
+        start = 0
+        for inputs, _ in tqdm(loader, desc=f"Caching dataset to {self.cache_path}", disable=not self.verbose):
+            if cache is None:
+                cache = np.lib.format.open_memmap(
+                    tmp_path, mode="w+", dtype=np.float16, shape=(len(self.dataset), *inputs.shape[1:])
+                )
+            cache[start:start + len(inputs)] = inputs.numpy().astype(np.float16)
+            start += len(inputs)
+        cache.flush()
+        del cache
+        os.replace(tmp_path, self.cache_path)
+
+    def __getstate__(self):
+        # the memory map is reopened lazily in each DataLoader worker
+        state = self.__dict__.copy()
+        state["_cache"] = None
+        return state
+
+    @property
+    def cache(self) -> np.ndarray:
+        """
+        Read-only memory map over the cached inputs
+        """
+        if self._cache is None:
+            self._cache = np.load(self.cache_path, mmap_mode="r")
+        return self._cache
+
+    @property
+    def group_partition(self) -> Dict[Tuple[int, int], List[int]]:
+        """
+        Dictionary partitioning indices into groups
+        """
+        return self.dataset.group_partition
+
+    @property
+    def group_weights(self) -> Dict[Tuple[int, int], float]:
+        """
+        Dictionary containing the fractional weights of each group
+        """
+        return self.dataset.group_weights
+
+    @property
+    def spurious(self) -> List[int]:
+        """
+        List containing spurious labels for each example
+        """
+        return self.dataset.spurious
+
+    @property
+    def labels(self) -> List[int]:
+        """
+        List containing class labels for each example
+        """
+        return self.dataset.labels
+
+    @property
+    def num_classes(self) -> int:
+        """
+        Number of classes
+        """
+        return self.dataset.num_classes
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        """
+        Get an item from the cache.
+
+        :param index: The index of the item to retrieve.
+        :type index: int
+        :return: A tuple containing the cached input (as float32) and the label.
+        :rtype: Tuple[torch.Tensor, int]
+        """
+        return torch.from_numpy(self.cache[index].astype(np.float32)), self.labels[index]
@@ -1,7 +1,7 @@
 from enum import Enum
 from tqdm import tqdm 
 import torchvision.transforms as transforms
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from PIL import Image
 import glob
 import os
@@ -48,6 +48,7 @@ class UrbanCars(BaseSpuCoCompatibleDataset):
         spurious_label_type: UrbanCarsSpuriousLabel = UrbanCarsSpuriousLabel.BOTH,
         verbose: bool = False,
         transform=None,
+        base_transform: Optional[Callable] = None,
     ):
         super().__init__()
         self.verbose = verbose
@@ -136,9 +137,11 @@ class UrbanCars(BaseSpuCoCompatibleDataset):
         self._co_occur_group_weights = self._compute_group_weights(self._co_occur_group_partition)
         self._both_flat_group_weights =  self._compute_group_weights(self._both_flat_group_partition)
         
-        self.base_transform = transforms.Compose([
-            transforms.ToTensor()
-        ])
+        if base_transform is None:
+            base_transform = transforms.Compose([
+                transforms.ToTensor()
+            ])
+        self.base_transform = base_transform
         
         if self.verbose:
             print("Done!")
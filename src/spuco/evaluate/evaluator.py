@@ -26,6 +26,8 @@ class Evaluator:
         device: torch.device = torch.device("cpu"),
         verbose: bool = False,
         num_workers: int = 4,
+        persistent_workers: bool = False,
+        amp_dtype: Optional[torch.dtype] = None,
     ):
         """
         Initializes an instance of the Evaluator class.
@@ -53,26 +55,84 @@ class Evaluator:
 
         :param verbose: Whether to print evaluation results. Default is False.
         :type verbose: bool, optional
+
+        :param num_workers: Number of DataLoader worker processes. Default is 4.
+        :type num_workers: int, optional
+
+        :param persistent_workers: Whether to keep the workers of the DataLoader used by evaluate() (without an sklearn 
+            linear model) alive between calls, useful when evaluating every epoch. The per-group and spurious 
+            DataLoaders never keep their workers. Ignored if num_workers is 0. Default is False.
+        :type persistent_workers: bool, optional
+
+        :param amp_dtype: If given (torch.bfloat16 or torch.float16), runs the model under autocast with this dtype 
+            when computing predictions. Features for sklearn_linear_model are always computed in full precision, 
+            matching how the linear model was fit. Default is None (full precision).
+        :type amp_dtype: torch.dtype, optional
         """
           
         seed_randomness(torch_module=torch, numpy_module=np, random_module=random)
 
-        self.testloaders = {}
-        self.group_partition = group_partition
-        self.group_weights = group_weights
+        self.batch_size = batch_size
         self.model = model
         self.device = device
         self.verbose = verbose
+        self.num_workers = num_workers
+        self.persistent_workers = persistent_workers and num_workers > 0
+        self.amp_dtype = amp_dtype
+
+        self.rebind(
+            testset=testset,
+            group_partition=group_partition,
+            group_weights=group_weights,
+            sklearn_linear_model=sklearn_linear_model
+        )
+
+    def rebind(
+        self,
+        testset: Dataset,
+        group_partition: Dict[Tuple[int, int], List[int]],
+        group_weights: Dict[Tuple[int, int], float],
+        sklearn_linear_model: Optional[Tuple[float, float, float, Optional[StandardScaler]]] = None,
+    ):
+        """
+        Points the evaluator at a new test set (and optionally a new sklearn linear model), 
+        keeping the model, device, batch size and DataLoader settings. 
+
+        :param testset: Dataset object containing the test set.
+        :type testset: Dataset
+
+        :param group_partition: Dictionary object mapping group keys to a list of indices corresponding to the test samples in that group.
+        :type group_partition: Dict[Tuple[int, int], List[int]]
+
+        :param group_weights: Dictionary object mapping group keys to their respective weights.
+        :type group_weights: Dict[Tuple[int, int], float]
+
+        :param sklearn_linear_model: Tuple representing the coefficients and intercept of the linear model from sklearn. Default is None.
+        :type sklearn_linear_model: Optional[Tuple[float, float, float, Optional[StandardScaler]]], optional
+        """
+        self.testloaders = {}
+        self.group_partition = group_partition
+        self.group_weights = group_weights
         self.accuracies = None
         self.sklearn_linear_model = sklearn_linear_model
         self.n_classes = np.max(testset.labels) + 1
-        self.num_workers = num_workers
 
         # Create DataLoaders 
 
         # Group-Wise DataLoader
         for key in group_partition.keys():
-            self.testloaders[key] = DataLoader(Subset(testset, group_partition[key]), batch_size=batch_size, num_workers=self.num_workers, pin_memory=True, shuffle=False)
+            self.testloaders[key] = self._dataloader(Subset(testset, group_partition[key]))
+
+        # Single DataLoader over all groups, with the (sorted) group index of every example 
+        self.group_keys = sorted(group_partition.keys())
+        indices = []
+        group_ids = []
+        for group_idx, key in enumerate(self.group_keys):
+            indices.extend(group_partition[key])
+            group_ids.extend([group_idx] * len(group_partition[key]))
+        self.group_ids = torch.tensor(group_ids, dtype=torch.long)
+        self.group_sizes = torch.bincount(self.group_ids, minlength=len(self.group_keys)).tolist()
+        self.testloader = self._dataloader(Subset(testset, indices), persistent_workers=self.persistent_workers)
         
         # SpuriousTarget Dataloader
         core_labels = []
@@ -83,32 +143,67 @@ class Evaluator:
                 spurious.append(key[1])
         try:
             spurious_dataset = SpuriousTargetDatasetWrapper(dataset=testset, spurious_labels=spurious, num_classes=np.max(core_labels) + 1)
-            self.spurious_dataloader = DataLoader(spurious_dataset, batch_size=batch_size, num_workers=self.num_workers, pin_memory=True)
+            self.spurious_dataloader = self._dataloader(spurious_dataset)
         except:
             print("WARNING: spurious dataloader not correctly intiialized, evaluating spurious attribute prediction may fail.")
 
+    def _autocast(self):
+        return torch.autocast(device_type=self.device.type, dtype=self.amp_dtype, enabled=self.amp_dtype is not None)
+
+    def _dataloader(self, dataset: Dataset, persistent_workers: bool = False) -> DataLoader:
+        # workers are only started once a loader is iterated
+        return DataLoader(
+            dataset, 
+            batch_size=self.batch_size, 
+            num_workers=self.num_workers, 
+            pin_memory=True, 
+            shuffle=False,
+            persistent_workers=persistent_workers
+        )
+
     def evaluate(self):
         """
         Evaluates the PyTorch model on the test dataset and computes the accuracy for each group.
         """
         self.model.eval()
-        self.accuracies = {}
-        for key in tqdm(sorted(self.group_partition.keys()), "Evaluating group-wise accuracy", ):
-            if self.sklearn_linear_model:
+        if self.sklearn_linear_model:
+            self.accuracies = {}
+            for key in tqdm(self.group_keys, "Evaluating group-wise accuracy", ):
                 self.accuracies[key] = self._evaluate_accuracy_sklearn_logreg(self.testloaders[key])
-            else:
-                self.accuracies[key] = self._evaluate_accuracy(self.testloaders[key])
-            if self.verbose:
+        else:
+            self.accuracies = self._evaluate_group_accuracies()
+        if self.verbose:
+            for key in self.group_keys:
                 print(f"Group {key} Accuracy: {self.accuracies[key]}")
         return self.accuracies
     
+    def _evaluate_group_accuracies(self):
+        """
+        Computes the accuracy of every group in a single pass over the test set, 
+        accumulating per-group correct counts on device with scatter_add_.
+        """
+        group_ids = self.group_ids.to(self.device)
+        correct = torch.zeros(len(self.group_keys), dtype=torch.long, device=self.device)
+        with torch.inference_mode():
+            start = 0
+            for inputs, labels in tqdm(self.testloader, "Evaluating group-wise accuracy"):
+                inputs, labels = inputs.to(self.device, non_blocking=True), labels.to(self.device, non_blocking=True)
+                with self._autocast():
+                    outputs = self.model(inputs)
+                predicted = torch.argmax(outputs, dim=1)
+                correct.scatter_add_(0, group_ids[start:start + labels.size(0)], (predicted == labels).long())
+                start += labels.size(0)
+        correct = correct.tolist()
+        return {key: 100 * correct[i] / self.group_sizes[i] for i, key in enumerate(self.group_keys)}
+    
     def _evaluate_accuracy(self, testloader: DataLoader):
-        with torch.no_grad():
+        with torch.inference_mode():
             correct = 0
             total = 0    
             for inputs, labels in testloader:
-                inputs, labels = inputs.to(self.device), labels.to(self.device)
-                outputs = self.model(inputs)
+                inputs, labels = inputs.to(self.device, non_blocking=True), labels.to(self.device, non_blocking=True)
+                with self._autocast():
+                    outputs = self.model(inputs)
                 predicted = torch.argmax(outputs, dim=1)
                 total += labels.size(0)
                 correct += (predicted == labels).sum().item()
@@ -136,9 +231,9 @@ class Evaluator:
         y_test = []
 
         self.model.eval()
-        with torch.no_grad():
+        with torch.inference_mode():
             for inputs, labels in testloader:
-                inputs, labels = inputs.to(self.device), labels.to(self.device)
+                inputs, labels = inputs.to(self.device, non_blocking=True), labels.to(self.device, non_blocking=True)
                 X_test.append(self.model.backbone(inputs))
                 y_test.append(labels)
             return torch.cat(X_test), torch.cat(y_test)
@@ -46,7 +46,7 @@ class BaseRobustTrain(ABC):
                 if self.val_evaluator.worst_group_accuracy[1] > self._best_wg_acc:
                     self._best_wg_acc = self.val_evaluator.worst_group_accuracy[1]
                     self._avg_acc_at_best_wg_acc = self.val_evaluator.average_accuracy
-                    self._best_model = deepcopy(self.trainer.model)
+                    self._best_model = deepcopy(self.trainer.unwrapped_model)
                     self._best_epoch = epoch
                 if self.verbose:
                     print('Epoch {}: {} Val Worst-Group Accuracy: {}'.format(epoch, self.trainer.name, self.val_evaluator.worst_group_accuracy[1]))
@@ -255,6 +255,13 @@ class CNCTrainer:
                 idx_batch += 1
             return average_accuracy / len(pbar), average_loss
     
+    @property
+    def unwrapped_model(self) -> nn.Module:
+        """
+        The model being trained (CNCTrainer does not support DistributedDataParallel).
+        """
+        return self.model
+
     @staticmethod
     def compute_accuracy(outputs: torch.Tensor, labels: torch.Tensor) -> float:
         """
@@ -1,4 +1,5 @@
 import random
+from typing import Optional
 
 import numpy as np
 import torch
@@ -28,7 +29,13 @@ class ERM(BaseRobustTrain):
         max_grad_norm=None,
         val_evaluator: Evaluator = None,
         verbose=False, 
-        use_wandb=False
+        use_wandb=False,
+        pin_memory: bool = True,
+        num_workers: int = 4,
+        persistent_workers: bool = True,
+        distributed: bool = False,
+        amp_dtype: Optional[torch.dtype] = None,
+        memory_format: torch.memory_format = torch.preserve_format
     ):
         """
         Initializes a ERM instance.
@@ -49,6 +56,18 @@ class ERM(BaseRobustTrain):
         :type device: torch.device, optional
         :param verbose: If True, prints verbose training information. Default is False.
         :type verbose: bool, optional
+        :param pin_memory: If True, the training DataLoader uses pinned host memory. Default is True.
+        :type pin_memory: bool, optional
+        :param num_workers: Number of DataLoader worker processes. Default is 4.
+        :type num_workers: int, optional
+        :param persistent_workers: If True, DataLoader workers are kept alive across epochs. Default is True.
+        :type persistent_workers: bool, optional
+        :param distributed: If True, trains with DistributedDataParallel; requires an initialized process group. Default is False.
+        :type distributed: bool, optional
+        :param amp_dtype: If given (torch.bfloat16 or torch.float16), trains with automatic mixed precision in this dtype. Default is None.
+        :type amp_dtype: torch.dtype, optional
+        :param memory_format: Memory format training inputs are converted to (e.g. torch.channels_last). Default is torch.preserve_format.
+        :type memory_format: torch.memory_format, optional
         """
         seed_randomness(torch_module=torch, numpy_module=np, random_module=random)
 
@@ -66,5 +85,11 @@ class ERM(BaseRobustTrain):
             verbose=verbose,
             device=device,
             name="ERM",
-            use_wandb=use_wandb
+            use_wandb=use_wandb,
+            pin_memory=pin_memory,
+            num_workers=num_workers,
+            persistent_workers=persistent_workers,
+            distributed=distributed,
+            amp_dtype=amp_dtype,
+            memory_format=memory_format
         )
@@ -120,4 +120,30 @@ def get_model_outputs(model, dataset, device=torch.device("cpu"), features=False
                     outputs.append(model.backbone(input.to(device)))
                 else:
                     outputs.append(model(input.to(device)))
-            return torch.cat(outputs, dim=0)
\ No newline at end of file
+            return torch.cat(outputs, dim=0)
+
+
+def fuse_input_normalization(conv: nn.Conv2d, mean: Tuple[float, ...], std: Tuple[float, ...]):
+    """
+    Folds a per-channel input normalization ((x - mean) / std) into the weights and bias of 
+    the first convolution of a model, so that the model can be fed unnormalized inputs.
+    Note: zero padding of the convolution now pads with 0 instead of mean, so outputs at the 
+    image border differ slightly from the unfused model.
+
+    :param conv: The convolution applied to the normalized input.
+    :type conv: nn.Conv2d
+    :param mean: Per-channel mean used for normalization.
+    :type mean: Tuple[float, ...]
+    :param std: Per-channel standard deviation used for normalization.
+    :type std: Tuple[float, ...]
+    """
+    with torch.no_grad():
+        weight = conv.weight
+        mean = torch.tensor(mean, dtype=weight.dtype, device=weight.device)[None, :, None, None]
+        std = torch.tensor(std, dtype=weight.dtype, device=weight.device)[None, :, None, None]
+        bias_shift = (weight * mean / std).sum(dim=(1, 2, 3))
+        weight.div_(std)
+        if conv.bias is None:
+            conv.bias = nn.Parameter(-bias_shift)
+        else:
+            conv.bias.sub_(bias_shift)
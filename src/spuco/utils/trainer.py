@@ -4,7 +4,9 @@ from typing import Any, Callable, Optional, Tuple
 import numpy as np
 import torch
 from torch import nn, optim
+from torch.nn.parallel import DistributedDataParallel
 from torch.utils.data import DataLoader, Dataset, Sampler
+from torch.utils.data.distributed import DistributedSampler
 from tqdm import tqdm
 
 from spuco.utils.random_seed import seed_randomness
@@ -30,7 +32,13 @@ class Trainer:
             device: torch.device = torch.device("cpu"),
             verbose: bool = False,
             name: str = "",
-            use_wandb: bool = False
+            use_wandb: bool = False,
+            pin_memory: bool = True,
+            num_workers: int = 4,
+            persistent_workers: bool = False,
+            distributed: bool = False,
+            amp_dtype: Optional[torch.dtype] = None,
+            memory_format: torch.memory_format = torch.preserve_format
     ) -> None:
         """
         Initializes an instance of the Trainer class.
@@ -53,6 +61,22 @@ class Trainer:
         :type device: torch.device, optional
         :param verbose: Whether to print training progress. Default is False.
         :type verbose: bool, optional
+        :param pin_memory: Whether the DataLoader should use page-locked host memory, allowing non-blocking copies to the device. Default is True.
+        :type pin_memory: bool, optional
+        :param num_workers: Number of DataLoader worker processes. Default is 4.
+        :type num_workers: int, optional
+        :param persistent_workers: Whether to keep DataLoader workers alive across epochs (ignored if num_workers is 0). Default is False.
+        :type persistent_workers: bool, optional
+        :param distributed: Whether to train with DistributedDataParallel (one process per device). Requires an initialized
+            torch.distributed process group; the trainset is sharded with a DistributedSampler if no sampler is given. batch_size is
+            per process, so the effective batch size is world_size * batch_size. Default is False.
+        :type distributed: bool, optional
+        :param amp_dtype: If given (torch.bfloat16 or torch.float16), runs the forward pass under autocast with this dtype.
+            Gradients are scaled with a GradScaler when using torch.float16. Default is None (full precision).
+        :type amp_dtype: torch.dtype, optional
+        :param memory_format: Memory format inputs are converted to by the default forward pass, e.g. torch.channels_last 
+            for a model converted to channels_last. Default is torch.preserve_format.
+        :type memory_format: torch.memory_format, optional
         """
         seed_randomness(torch_module=torch, numpy_module=np, random_module=random)
 
@@ -69,11 +93,32 @@ class Trainer:
         self.device = device
         self.name = name
         self.use_wandb = use_wandb
+        self.pin_memory = pin_memory
+        self.num_workers = num_workers
+        self.persistent_workers = persistent_workers and num_workers > 0
+        self.distributed = distributed
+        self.amp_dtype = amp_dtype
+        self.memory_format = memory_format
+        self.grad_scaler = None
+        if amp_dtype == torch.float16:
+            if hasattr(torch.amp, "GradScaler"):
+                self.grad_scaler = torch.amp.GradScaler(self.device.type)
+            else:
+                self.grad_scaler = torch.cuda.amp.GradScaler()
+
+        if self.distributed:
+            if self.sampler is None:
+                self.sampler = DistributedSampler(self.trainset)
+            self.model = DistributedDataParallel(
+                self.model, 
+                device_ids=[self.device] if self.device.type == "cuda" else None
+            )
         
         if forward_pass is None:
             def forward_pass(self, batch):
                 inputs, labels = batch
-                inputs, labels = inputs.to(self.device), labels.to(self.device)
+                inputs = inputs.to(self.device, non_blocking=True, memory_format=self.memory_format)
+                labels = labels.to(self.device, non_blocking=True)
                 outputs = self.model(inputs)
                 loss = self.criterion(outputs, labels)
                 return loss, outputs, labels
@@ -86,8 +131,9 @@ class Trainer:
             batch_size=self.batch_size, 
             shuffle=(self.sampler is None), 
             sampler=self.sampler,
-            num_workers=4, 
-            pin_memory=True
+            num_workers=self.num_workers, 
+            pin_memory=self.pin_memory,
+            persistent_workers=self.persistent_workers
         )
 
     def train(self, num_epochs: int):
@@ -108,23 +154,35 @@ class Trainer:
         :type epoch: int
         """
         self.model.train()
+        if isinstance(self.sampler, DistributedSampler):
+            self.sampler.set_epoch(epoch)
         batch_idx = 0
         with tqdm(self.trainloader, unit="batch", total=len(self.trainloader), disable=not self.verbose) as pbar:
             pbar.set_description(f"Epoch {epoch}")
             average_accuracy = 0.
             average_loss = 0.
             for batch in pbar:
-                loss, outputs, labels = self.forward_pass(self, batch)
+                with torch.autocast(device_type=self.device.type, dtype=self.amp_dtype, enabled=self.amp_dtype is not None):
+                    loss, outputs, labels = self.forward_pass(self, batch)
                 accuracy = Trainer.compute_accuracy(outputs, labels)
 
                 # backward pass and optimization
-                self.optimizer.zero_grad()
-                loss.backward()
+                self.optimizer.zero_grad(set_to_none=True)
+                if self.grad_scaler is not None:
+                    self.grad_scaler.scale(loss).backward()
+                else:
+                    loss.backward()
                 if self.max_grad_norm is not None:
+                    if self.grad_scaler is not None:
+                        self.grad_scaler.unscale_(self.optimizer)
                     nn.utils.clip_grad_norm_(self.model.parameters(), self.max_grad_norm)
                 if self.lr_scheduler is not None and isinstance(self.optimizer, optim.AdamW):
                     self.lr_scheduler.step()
-                self.optimizer.step()
+                if self.grad_scaler is not None:
+                    self.grad_scaler.step(self.optimizer)
+                    self.grad_scaler.update()
+                else:
+                    self.optimizer.step()
 
                 pbar.set_postfix(loss=loss.item(), accuracy=f"{accuracy}%")
                 if self.verbose:
@@ -141,6 +199,15 @@ class Trainer:
                 
             return average_accuracy / len(pbar), average_loss / len(pbar)
     
+    @property
+    def unwrapped_model(self) -> nn.Module:
+        """
+        The model being trained, without the DistributedDataParallel wrapper (if any).
+        """
+        if isinstance(self.model, DistributedDataParallel):
+            return self.model.module
+        return self.model
+
     @staticmethod
     def compute_accuracy(outputs: torch.Tensor, labels: torch.Tensor) -> float:
         """
@@ -162,5 +229,5 @@ class Trainer:
         """
         Gets output of model on trainset
         """
-        return get_model_outputs(self.model, self.trainset, self.device, features, self.verbose)
+        return get_model_outputs(self.unwrapped_model, self.trainset, self.device, features, self.verbose)
             